@@ -1,8 +1,9 @@
 import math
 import os
-import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 import matplotlib
 import numpy as np
 import torch
@@ -13,6 +14,51 @@ from PIL import Image
 from torch import Tensor, optim
 
 
+@contextmanager
+def cuda_timer(events: Optional[List]):
+    """Records a pair of CUDA events around the block if `events` is given."""
+    if events is None:
+        yield
+        return
+    start = torch.cuda.Event(enable_timing=True)
+    end = torch.cuda.Event(enable_timing=True)
+    start.record()
+    yield
+    end.record()
+    events.append((start, end))
+
+
+def random_quats(u: Tensor, v: Tensor, w: Tensor) -> Tensor:
+    """Uniformly distributed unit quaternions from three U(0, 1) samples."""
+    s = torch.sqrt(1.0 - u)
+    t = torch.sqrt(u)
+    a = 2.0 * math.pi * v
+    b = 2.0 * math.pi * w
+    return torch.cat([s * a.sin(), s * a.cos(), t * b.sin(), t * b.cos()], -1)
+
+
+def _spread_bits(x: Tensor) -> Tensor:
+    """Interleaves two zero bits after each of the low 10 bits of x."""
+    x = (x | (x << 16)) & 0x030000FF
+    x = (x | (x << 8)) & 0x0300F00F
+    x = (x | (x << 4)) & 0x030C30C3
+    x = (x | (x << 2)) & 0x09249249
+    return x
+
+
+def morton_order(points: Tensor) -> Tensor:
+    """Permutation that sorts 3D points along a Z-order (Morton) curve."""
+    lo = points.min(dim=0).values
+    hi = points.max(dim=0).values
+    q = ((points - lo) / (hi - lo).clamp_min(1e-12) * 1023).long()
+    codes = (
+        _spread_bits(q[:, 0])
+        | (_spread_bits(q[:, 1]) << 1)
+        | (_spread_bits(q[:, 2]) << 2)
+    )
+    return torch.argsort(codes)
+
+
 class SimpleTrainer:
     """Trains random gaussians to fit an image."""
 
@@ -42,7 +88,9 @@ class SimpleTrainer:
         right = tanHalfFovX * znear
         left = -right
 
-        P = torch.zeros(4, 4)
+        # filled on the host and uploaded once, instead of one indexed
+        # assignment per entry on a torch tensor
+        P = np.zeros((4, 4), dtype=np.float32)
 
         z_sign = 1.0
 
@@ -53,7 +101,7 @@ class SimpleTrainer:
         P[3, 2] = z_sign
         P[2, 2] = z_sign * zfar / (zfar - znear)
         P[2, 3] = -(zfar * znear) / (zfar - znear)
-        return P
+        return torch.from_numpy(P).to(self.device)
 
     #
     # def focal2fov(self, focal, pixels):
@@ -128,11 +176,11 @@ class SimpleTrainer:
     def _init_gaussians(self):
         """Random gaussians"""
         bd = 2
+        d = 3
         self.means = bd * (torch.rand(self.num_points, 3, device=self.device) - 0.5)
         self.scales = torch.rand(self.num_points, 3, device=self.device)
-        self.projmat = self.getProjectionMatrix(znear=0.2, zfar=1000, fovX=self.focal, fovY=self.focal).transpose(0, 1).cuda()
+        self.projmat = self.getProjectionMatrix(znear=0.2, zfar=1000, fovX=self.focal, fovY=self.focal).transpose(0, 1)
 
-        d = 3
         self.background = torch.zeros(d, device=self.device)
         # self.means3D, self.scales, self.quats, self.opacities, self.colors = self.get_inputs(num_points=bd)
         # intrins, self.viewmat, self.projmat, self.height, self.width = self.get_cameras()
@@ -145,16 +193,14 @@ class SimpleTrainer:
         v = torch.rand(self.num_points, 1, device=self.device)
         w = torch.rand(self.num_points, 1, device=self.device)
 
-        self.quats = torch.cat(
-            [
-                torch.sqrt(1.0 - u) * torch.sin(2.0 * math.pi * v),
-                torch.sqrt(1.0 - u) * torch.cos(2.0 * math.pi * v),
-                torch.sqrt(u) * torch.sin(2.0 * math.pi * w),
-                torch.sqrt(u) * torch.cos(2.0 * math.pi * w),
-            ],
-            -1,
-        )
+        self.quats = random_quats(u, v, w)
         self.opacities = torch.ones((self.num_points, 1), device=self.device)
+        # store spatially close gaussians next to each other, so the
+        # tile-sorted accesses in the kernels hit nearby memory
+        order = morton_order(self.means)
+        self.means, self.scales, self.quats, self.opacities, self.rgbs = (
+            t[order] for t in (self.means, self.scales, self.quats, self.opacities, self.rgbs)
+        )
         # self.projmat = getProjectionMatrix(self.znear, self.zfar, fov_x, fov_y)
         self.viewmat = torch.tensor(
             [
@@ -165,6 +211,9 @@ class SimpleTrainer:
             ],
             device=self.device,
         )
+        # world-to-NDC transform in the transposed (row-vector) layout the
+        # 2d projection kernel expects; the camera is fixed, so build it once
+        self.full_proj = (self.viewmat.transpose(0, 1) @ self.projmat).contiguous()
 
         self.means.requires_grad = True
         self.scales.requires_grad = True
@@ -185,28 +234,24 @@ class SimpleTrainer:
             iterations: int = 1000,
             lr: float = 0.01,
             save_imgs: bool = False,
+            profile: bool = False,
+            bf16: bool = False,
+            cuda_graph: bool = False,
     ):
-        optimizer = optim.Adam(
-            [self.rgbs, self.means, self.scales, self.opacities, self.quats], lr
-        )
-        # optimizer = optim.Adam(
-        #     [self.means3D, self.scales, self.quats, self.opacities, self.colors], lr
-        # )
-        mse_loss = torch.nn.MSELoss()
-        frames = []
-        times = [0] * 3  # project, rasterize, backward
+        # dtype the projection reads the gaussians in; Adam keeps updating
+        # the float32 master copies of the parameters
+        param_dtype = torch.bfloat16 if bf16 else torch.float32
         B_SIZE = 16
-        for iter in range(iterations):
-            start = time.time()
-            # print("view shape:", self.viewmat.shape)
-            xys, depths, transMats, normal, radii, num_tiles_hit = project_gaussians_2d(
-                self.means,
-                self.scales,
+
+        def project(means: Tensor, scales: Tensor, quats: Tensor, opacities: Tensor):
+            return project_gaussians_2d(
+                means.to(param_dtype),
+                scales.to(param_dtype),
                 1,
-                self.quats,
-                self.opacities,
+                quats.to(param_dtype),
+                opacities.to(param_dtype),
                 self.viewmat,
-                self.projmat,
+                self.full_proj,
                 self.focal,
                 self.focal,
                 self.W / 2,
@@ -214,48 +259,98 @@ class SimpleTrainer:
                 self.H,
                 self.W,
                 B_SIZE,
-                0.01
+                0.01,
+                apply_sigmoid=True,
             )
 
-            torch.cuda.synchronize()
+        if cuda_graph:
+            # only the projection has fixed shapes; the rasterizer sizes its
+            # buffers from the number of tile intersections, which needs a
+            # host sync and changes every step, so it cannot be captured
+            project = torch.cuda.make_graphed_callables(
+                project, (self.means, self.scales, self.quats, self.opacities)
+            )
+        optimizer = optim.Adam(
+            [self.rgbs, self.means, self.scales, self.opacities, self.quats], lr
+        )
+        # optimizer = optim.Adam(
+        #     [self.means3D, self.scales, self.quats, self.opacities, self.colors], lr
+        # )
+        mse_loss = torch.nn.MSELoss()
+        frames = []
+        if save_imgs:
+            # frames go GPU -> pinned host memory on a side stream and are
+            # turned into PIL images on a worker thread, so saving them never
+            # blocks the training loop; a small ring of pinned slots is
+            # reused, so page-locked memory does not grow with the run
+            copy_stream = torch.cuda.Stream()
+            staging = [
+                torch.empty((self.H, self.W, 3), dtype=torch.uint8, pin_memory=True)
+                for _ in range(4)
+            ]
+            executor = ThreadPoolExecutor(max_workers=1)
+
+            def to_image(frame: Tensor, copied: torch.cuda.Event) -> Image.Image:
+                copied.synchronize()
+                # copy into pageable memory before the slot is handed out again
+                return Image.fromarray(frame.numpy().copy())
+        # (start, end) CUDA event pairs per stage: project, rasterize, backward
+        events = [[], [], []]
+        for iter in range(iterations):
+            # print("view shape:", self.viewmat.shape)
+            with cuda_timer(events[0] if profile else None):
+                xys, depths, transMats, normal, radii, num_tiles_hit = project(
+                    self.means, self.scales, self.quats, self.opacities
+                )
 
-            times[0] += time.time() - start
-            start = time.time()
             # print(normal[:, 3:4].shape)
-            out_img = rasterize_gaussians_2d(xys,
-                                                transMats,
-                                                depths,
-                                                radii,
-                                                num_tiles_hit,
-                                                torch.sigmoid(self.rgbs),
-                                                torch.sigmoid(normal),
-                                                self.H,
-                                                self.W,
-                                                B_SIZE,
-                                                background=torch.zeros(3).cuda(),
-                                                return_alpha=False)
+            with cuda_timer(events[1] if profile else None):
+                rgbs = self.rgbs.sigmoid()
+                out_img, _ = rasterize_gaussians_2d(xys,
+                                                    transMats,
+                                                    depths,
+                                                    radii,
+                                                    num_tiles_hit,
+                                                    rgbs,
+                                                    normal,
+                                                    self.H,
+                                                    self.W,
+                                                    B_SIZE,
+                                                    background=self.background,
+                                                    return_alpha=False)
 
             # img1 = out_img.detach().cpu().numpy()
             # rgb_np = (img1 * 255).astype(np.uint8)
             # image = Image.fromarray(rgb_np)
             # image.save('output_image.jpg')
 
-            torch.cuda.synchronize()
-            times[1] += time.time() - start
             loss = mse_loss(out_img, self.gt_image)
-            optimizer.zero_grad()
-            start = time.time()
-            loss.backward()
-            torch.cuda.synchronize()
-            times[2] += time.time() - start
+            optimizer.zero_grad(set_to_none=True)
+            with cuda_timer(events[2] if profile else None):
+                loss.backward()
             optimizer.step()
-            print(f"Iteration {iter + 1}/{iterations}, Loss: {loss.item()}")
+            # loss.item() syncs with the device, so only read it back now and then
+            if (iter + 1) % 100 == 0 or iter + 1 == iterations:
+                print(f"Iteration {iter + 1}/{iterations}, Loss: {loss.item()}")
 
             if save_imgs and iter % 5 == 0:
-                frames.append((out_img.detach().cpu().numpy() * 255).astype(np.uint8))
+                slot = staging[len(frames) % len(staging)]
+                if len(frames) >= len(staging):
+                    # the worker must be done reading this slot before it is
+                    # overwritten; it only blocks if it fell a full ring behind
+                    frames[-len(staging)].result()
+                frame = (out_img.detach() * 255).to(torch.uint8)
+                copy_stream.wait_stream(torch.cuda.current_stream())
+                with torch.cuda.stream(copy_stream):
+                    slot.copy_(frame, non_blocking=True)
+                    frame.record_stream(copy_stream)
+                    copied = torch.cuda.Event()
+                    copied.record()
+                frames.append(executor.submit(to_image, slot, copied))
         if save_imgs:
             # save them as a gif with PIL
-            frames = [Image.fromarray(frame) for frame in frames]
+            frames = [frame.result() for frame in frames]
+            executor.shutdown()
             out_dir = os.path.join(os.getcwd(), "renders")
             os.makedirs(out_dir, exist_ok=True)
             frames[0].save(
@@ -266,12 +361,19 @@ class SimpleTrainer:
                 duration=5,
                 loop=0,
             )
-        print(
-            f"Total(s):\nProject: {times[0]:.3f}, Rasterize: {times[1]:.3f}, Backward: {times[2]:.3f}"
-        )
-        print(
-            f"Per step(s):\nProject: {times[0] / iterations:.5f}, Rasterize: {times[1] / iterations:.5f}, Backward: {times[2] / iterations:.5f}"
-        )
+        if profile:
+            # a single sync at the end, so the timed loop keeps the GPU queue full
+            torch.cuda.synchronize()
+            times = [
+                sum(start.elapsed_time(end) for start, end in stage) / 1000
+                for stage in events
+            ]
+            print(
+                f"Total(s):\nProject: {times[0]:.3f}, Rasterize: {times[1]:.3f}, Backward: {times[2]:.3f}"
+            )
+            print(
+                f"Per step(s):\nProject: {times[0] / iterations:.5f}, Rasterize: {times[1] / iterations:.5f}, Backward: {times[2] / iterations:.5f}"
+            )
 
 
 def image_path_to_tensor(image_path: Path):
@@ -291,6 +393,9 @@ def main(
         img_path: Optional[Path] = None,
         iterations: int = 1000,
         lr: float = 0.01,
+        profile: bool = False,
+        bf16: bool = False,
+        cuda_graph: bool = False,
 ) -> None:
     if img_path:
         gt_image = image_path_to_tensor(img_path)
@@ -305,6 +410,9 @@ def main(
         iterations=iterations,
         lr=lr,
         save_imgs=save_imgs,
+        profile=profile,
+        bf16=bf16,
+        cuda_graph=cuda_graph,
     )
 
 
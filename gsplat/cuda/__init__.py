@@ -6,7 +6,11 @@ def _make_lazy_cuda_func(name: str) -> Callable:
         # pylint: disable=import-outside-toplevel
         from ._backend import _C
 
-        return getattr(_C, name)(*args, **kwargs)
+        fn = getattr(_C, name)
+        # rebind the module attribute to the extension function, so later
+        # calls through `gsplat.cuda.<name>` skip this wrapper entirely
+        globals()[name] = fn
+        return fn(*args, **kwargs)
 
     return call_cuda
 
@@ -26,5 +30,3 @@ compute_sh_forward = _make_lazy_cuda_func("compute_sh_forward")
 compute_sh_backward = _make_lazy_cuda_func("compute_sh_backward")
 map_gaussian_to_intersects = _make_lazy_cuda_func("map_gaussian_to_intersects")
 get_tile_bin_edges = _make_lazy_cuda_func("get_tile_bin_edges")
-rasterize_forward = _make_lazy_cuda_func("rasterize_forward")
-nd_rasterize_forward = _make_lazy_cuda_func("nd_rasterize_forward")
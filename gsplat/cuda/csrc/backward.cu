@@ -532,7 +532,7 @@ __device__ void compute_transmat_aabb(
     const float3* dL_dmean2Ds,
     float* dL_dTs, 
 	glm::vec3* dL_dmeans,
-	glm::vec2* dL_dscales,
+	glm::vec3* dL_dscales,
     glm::vec4* dL_drots
     ) {
 
@@ -650,9 +650,11 @@ __device__ void compute_transmat_aabb(
 		dL_dRS[2]);
 	
 	dL_drots[idx] = quat_to_rotmat_vjp_2d(rot, dL_dR);
-	dL_dscales[idx] = glm::vec2(
+	// 2d gaussians have no scale along the normal, its gradient stays zero
+	dL_dscales[idx] = glm::vec3(
 		(float)glm::dot(dL_dRS[0], R[0]),
-		(float)glm::dot(dL_dRS[1], R[1])
+		(float)glm::dot(dL_dRS[1], R[1]),
+		0.f
 	);
 	dL_dmeans[idx] = glm::vec3(dL_dM[2]);
 
@@ -676,7 +678,7 @@ __global__ void project_gaussians_backward_kernel_2d(
     float* __restrict__ dL_dtransMats,
     float3* __restrict__ dL_dmean2Ds,
     glm::vec3* __restrict__ dL_dmean3Ds,
-    glm::vec2* __restrict__ dL_dscales,
+    glm::vec3* __restrict__ dL_dscales,
     glm::vec4* __restrict__ dL_drots
 ) {
 //     printf("is right");
@@ -49,7 +49,7 @@ __global__ void project_gaussians_backward_kernel_2d(
     float* __restrict__ dL_dtransMats,
     float3* __restrict__ dL_dmean2Ds,
     glm::vec3* __restrict__ dL_dmean3Ds,
-    glm::vec2* __restrict__ dL_dscales,
+    glm::vec3* __restrict__ dL_dscales,
     glm::vec4* __restrict__ dL_drots
 );
 
@@ -134,7 +134,7 @@ __global__ void project_gaussians_backward_kernel_2d(
     float* __restrict__ dL_dtransMats,
     float3* __restrict__ dL_dmean2Ds,
     glm::vec3* __restrict__ dL_dmean3Ds,
-    glm::vec2* __restrict__ dL_dscales,
+    glm::vec3* __restrict__ dL_dscales,
     glm::vec4* __restrict__ dL_drots
 );
 
@@ -334,7 +334,8 @@ project_gaussians_forward_tensor_2d(
     const unsigned img_height,       // 圖像高度
     const unsigned img_width,        // 圖像寬度
     const unsigned block_width,      // 磚塊寬度
-    const float clip_thresh          // 剪裁閾值
+    const float clip_thresh,         // 剪裁閾值
+    const bool apply_sigmoid         // 對 normal/opacity 套用 sigmoid
 ) {
     DEVICE_GUARD(means3d);           // 設置設備防護
 
@@ -352,38 +353,79 @@ project_gaussians_forward_tensor_2d(
     // 設置相機內部參數
     float4 intrins = {fx, fy, cx, cy};
 
+    // a (B, 4, 4) viewmat/projmat pair projects the gaussians into B cameras
+    // in one launch, and every output gains a leading camera dimension
+    const bool batched = viewmat.dim() == 3;
+    const int num_cameras = batched ? viewmat.size(0) : 1;
+    TORCH_CHECK(
+        projmat.dim() == viewmat.dim() && projmat.numel() == viewmat.numel(),
+        "viewmat and projmat must describe the same number of cameras"
+    );
+    const int64_t M = (int64_t)num_cameras * num_points;
+    auto out_shape = [&](std::vector<int64_t> tail) {
+        std::vector<int64_t> shape;
+        if (batched) shape.push_back(num_cameras);
+        shape.push_back(num_points);
+        shape.insert(shape.end(), tail.begin(), tail.end());
+        return shape;
+    };
+
     // 初始化輸出張量
-    torch::Tensor xys_d = torch::zeros({num_points, 2}, means3d.options().dtype(torch::kFloat32));
-    torch::Tensor depths_d = torch::zeros({num_points}, means3d.options().dtype(torch::kFloat32));
-    torch::Tensor transMats_d = torch::zeros({num_points, 3, 3}, means3d.options().dtype(torch::kFloat32));
-    torch::Tensor radii_d = torch::zeros({num_points}, means3d.options().dtype(torch::kInt32));
-    torch::Tensor num_tiles_hit_d = torch::zeros({num_points}, means3d.options().dtype(torch::kInt32));
-    torch::Tensor normal3d_d = torch::zeros({num_points, 4}, means3d.options().dtype(torch::kFloat32));
+    // the outputs are carved out of one float slab and one int slab so each
+    // call makes two allocations instead of six; every output is a contiguous
+    // sub-block of its slab, laid out as xys | depths | transMats | normal
+    // and radii | num_tiles_hit
+    torch::Tensor float_slab = torch::zeros({M * 16}, means3d.options().dtype(torch::kFloat32));
+    torch::Tensor int_slab = torch::zeros({M * 2}, means3d.options().dtype(torch::kInt32));
+    torch::Tensor xys_d = float_slab.narrow(0, 0, M * 2).view(out_shape({2}));
+    torch::Tensor depths_d = float_slab.narrow(0, M * 2, M).view(out_shape({}));
+    torch::Tensor transMats_d = float_slab.narrow(0, M * 3, M * 9).view(out_shape({3, 3}));
+    torch::Tensor normal3d_d = float_slab.narrow(0, M * 12, M * 4).view(out_shape({4}));
+    torch::Tensor radii_d = int_slab.narrow(0, 0, M).view(out_shape({}));
+    torch::Tensor num_tiles_hit_d = int_slab.narrow(0, M, M).view(out_shape({}));
     
+    // gaussian parameters may be stored in reduced precision, the kernel
+    // converts them to float on load
+    TORCH_CHECK(
+        scales.scalar_type() == means3d.scalar_type() &&
+            quats.scalar_type() == means3d.scalar_type() &&
+            opacities.scalar_type() == means3d.scalar_type(),
+        "means3d, scales, quats and opacities must have the same dtype"
+    );
+
     // 啟動 CUDA 核心函數
-    project_gaussians_forward_kernel_2d<<<
-        (num_points + N_THREADS - 1) / N_THREADS,
-        N_THREADS>>>(
-        num_points,
-        (float3 *)means3d.contiguous().data_ptr<float>(),
-        (float3 *)scales.contiguous().data_ptr<float>(),
-        glob_scale,
-        (float4 *)quats.contiguous().data_ptr<float>(),
-        opacities.contiguous().data_ptr<float>(),
-        viewmat.contiguous().data_ptr<float>(),
-        projmat.contiguous().data_ptr<float>(),
-        intrins,
-        img_size_dim3,
-        tile_bounds_dim3,
-        block_width,
-        clip_thresh,
-        // 輸出參數
-        (float2 *)xys_d.contiguous().data_ptr<float>(),
-        depths_d.contiguous().data_ptr<float>(),
-        (float *)transMats_d.contiguous().data_ptr<float>(),
-        (float4 *)normal3d_d.contiguous().data_ptr<float>(),
-        radii_d.contiguous().data_ptr<int>(),
-        num_tiles_hit_d.contiguous().data_ptr<int32_t>()
+    AT_DISPATCH_FLOATING_TYPES_AND2(
+        at::ScalarType::Half,
+        at::ScalarType::BFloat16,
+        means3d.scalar_type(),
+        "project_gaussians_forward_2d",
+        [&] {
+            project_gaussians_forward_kernel_2d<scalar_t><<<
+                dim3((num_points + N_THREADS - 1) / N_THREADS, num_cameras),
+                N_THREADS>>>(
+                num_points,
+                means3d.contiguous().data_ptr<scalar_t>(),
+                scales.contiguous().data_ptr<scalar_t>(),
+                glob_scale,
+                quats.contiguous().data_ptr<scalar_t>(),
+                opacities.contiguous().data_ptr<scalar_t>(),
+                viewmat.contiguous().data_ptr<float>(),
+                projmat.contiguous().data_ptr<float>(),
+                intrins,
+                img_size_dim3,
+                tile_bounds_dim3,
+                block_width,
+                clip_thresh,
+                apply_sigmoid,
+                // 輸出參數
+                (float2 *)xys_d.contiguous().data_ptr<float>(),
+                depths_d.contiguous().data_ptr<float>(),
+                (float *)transMats_d.contiguous().data_ptr<float>(),
+                (float4 *)normal3d_d.contiguous().data_ptr<float>(),
+                radii_d.contiguous().data_ptr<int>(),
+                num_tiles_hit_d.contiguous().data_ptr<int32_t>()
+            );
+        }
     );
 
     // 返回輸出張量的元組
@@ -421,7 +463,7 @@ project_gaussians_backward_tensor_2d(
 
     torch::Tensor dL_dmean2Ds = torch::zeros({num_points, 3}, means3d.options().dtype(torch::kFloat32));
     torch::Tensor dL_dmean3Ds = torch::zeros({num_points, 3}, means3d.options().dtype(torch::kFloat32));
-    torch::Tensor dL_dscales = torch::zeros({num_points, 2}, means3d.options().dtype(torch::kFloat32));
+    torch::Tensor dL_dscales = torch::zeros({num_points, 3}, means3d.options().dtype(torch::kFloat32));
     torch::Tensor dL_drots = torch::zeros({num_points, 4}, means3d.options().dtype(torch::kFloat32));
     torch::Tensor dL_dtransMats = torch::zeros({num_points, 9}, means3d.options());
 
@@ -443,7 +485,7 @@ project_gaussians_backward_tensor_2d(
         (float *)dL_dtransMats.contiguous().data_ptr<float>(),
         (float3 *)dL_dmean2Ds.contiguous().data_ptr<float>(),
         (glm::vec3 *)dL_dmean3Ds.contiguous().data_ptr<float>(),
-        (glm::vec2 *)dL_dscales.contiguous().data_ptr<float>(),
+        (glm::vec3 *)dL_dscales.contiguous().data_ptr<float>(),
         (glm::vec4 *)dL_drots.contiguous().data_ptr<float>()
     );
 
@@ -534,6 +576,23 @@ rasterize_forward_tensor(
     const torch::Tensor &opacities,
     const torch::Tensor &background
 ) {
+    // the float3 kernel only handles RGB, any other channel count goes
+    // through the N-dimensional kernel
+    if (colors.size(1) != 3) {
+        return nd_rasterize_forward_tensor(
+            tile_bounds,
+            block,
+            img_size,
+            gaussian_ids_sorted,
+            tile_bins,
+            xys,
+            conics,
+            colors,
+            opacities,
+            background
+        );
+    }
+
     DEVICE_GUARD(xys);
     CHECK_INPUT(gaussian_ids_sorted);
     CHECK_INPUT(tile_bins);
@@ -851,10 +910,30 @@ std::
         AT_ERROR("xys must have dimensions (num_points, 2)");
     }
 
-    if (colors.ndimension() != 2 || colors.size(1) != 3) {
+    if (colors.ndimension() != 2) {
         AT_ERROR("colors must have 2 dimensions");
     }
 
+    // see rasterize_forward_tensor
+    if (colors.size(1) != 3) {
+        return nd_rasterize_backward_tensor(
+            img_height,
+            img_width,
+            block_width,
+            gaussians_ids_sorted,
+            tile_bins,
+            xys,
+            conics,
+            colors,
+            opacities,
+            background,
+            final_Ts,
+            final_idx,
+            v_output,
+            v_output_alpha
+        );
+    }
+
     const int num_points = xys.size(0);
     const dim3 tile_bounds = {
         (img_width + block_width - 1) / block_width,
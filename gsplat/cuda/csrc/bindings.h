@@ -87,7 +87,8 @@ project_gaussians_forward_tensor_2d(
     const unsigned img_height,       // 圖像高度
     const unsigned img_width,        // 圖像寬度
     const unsigned block_width,      // 磚塊寬度
-    const float clip_thresh          // 剪裁閾值
+    const float clip_thresh,         // 剪裁閾值
+    const bool apply_sigmoid         // 對 normal/opacity 套用 sigmoid
 );
 
 std::tuple<
@@ -6,6 +6,8 @@
 #include <iostream>
 #include <cuda_fp16.h>
 #include <assert.h>
+#include <c10/util/BFloat16.h>
+#include <c10/util/Half.h>
 
 namespace cg = cooperative_groups;
 
@@ -614,13 +616,16 @@ __device__ bool compute_aabb(
 
 // kernel function for projecting each gaussian on device
 // each thread processes one gaussian
+// gaussian parameters are read as T (float, half or bfloat16), all the math
+// is done in float
+template <typename T>
 __global__ void project_gaussians_forward_kernel_2d(
     const int num_points,
-    const float3* __restrict__ means3d,
-    const float3* __restrict__ scales,
+    const T* __restrict__ means3d,
+    const T* __restrict__ scales,
     const float glob_scale,
-    const float4* __restrict__ quats,
-    const float* opacities,
+    const T* __restrict__ quats,
+    const T* __restrict__ opacities,
     const float* __restrict__ viewmat,
     const float* __restrict__ projmat,
     const float4 intrins,
@@ -628,6 +633,7 @@ __global__ void project_gaussians_forward_kernel_2d(
     const dim3 tile_bounds,
     const unsigned block_width,
     const float clip_thresh,
+    const bool apply_sigmoid,
     float2* __restrict__ xys,
     float* __restrict__ depths,
     float* __restrict__ transMats,
@@ -635,14 +641,22 @@ __global__ void project_gaussians_forward_kernel_2d(
     int* __restrict__ radii,
     int32_t* __restrict__ num_tiles_hit
 ) {
-    unsigned idx = cg::this_grid().thread_rank(); // idx of thread within grid
+    // blockIdx.x walks the gaussians, blockIdx.y the cameras of a batch
+    unsigned idx = blockIdx.x * blockDim.x + threadIdx.x;
     if (idx >= num_points) {
         return;
     }
-    radii[idx] = 0;
-    num_tiles_hit[idx] = 0;
-
-    float3 p_world = means3d[idx];
+    // move to this camera's matrices and output rows
+    const unsigned cam = blockIdx.y;
+    const unsigned out = cam * num_points + idx;
+    viewmat += 16 * cam;
+    projmat += 16 * cam;
+    radii[out] = 0;
+    num_tiles_hit[out] = 0;
+
+    float3 p_world = {
+        (float)means3d[3 * idx], (float)means3d[3 * idx + 1], (float)means3d[3 * idx + 2]
+    };
     // printf("before clip near plane p_word %d %.2f %.2f %.2f\n", idx, p_world.x, p_world.y, p_world.z);
     // printf("p_world %d %.2f %.2f %.2f\n", idx, p_world.x, p_world.y,
     // p_world.z);
@@ -654,8 +668,15 @@ __global__ void project_gaussians_forward_kernel_2d(
     // printf("after clip near plane p_view %d %.2f %.2f %.2f\n", idx, p_view.x, p_view.y, p_view.z);
 
     // compute the projected covariance
-    float3 scale = scales[idx];
-    float4 quat = quats[idx];
+    float3 scale = {
+        (float)scales[3 * idx], (float)scales[3 * idx + 1], (float)scales[3 * idx + 2]
+    };
+    float4 quat = {
+        (float)quats[4 * idx],
+        (float)quats[4 * idx + 1],
+        (float)quats[4 * idx + 2],
+        (float)quats[4 * idx + 3]
+    };
     // printf("%d scale %.2f %.2f %.2f\n", idx, scale.x, scale.y, scale.z);
     // printf("%d quat %.2f %.2f %.2f %.2f\n", idx, quat.w, quat.x, quat.y,
     // quat.z);
@@ -667,9 +688,9 @@ __global__ void project_gaussians_forward_kernel_2d(
     compute_transmat(p_world, scale, glob_scale, quat, viewmat, projmat, img_size.x, img_size.y, T, normal);
     float3 *T_ptr = (float3*)transMats;
 
-    T_ptr[idx * 3 + 0] = {T[0][0], T[0][1], T[0][2]};
-    T_ptr[idx * 3 + 1] = {T[1][0], T[1][1], T[1][2]};
-    T_ptr[idx * 3 + 2] = {T[2][0], T[2][1], T[2][2]};
+    T_ptr[out * 3 + 0] = {T[0][0], T[0][1], T[0][2]};
+    T_ptr[out * 3 + 1] = {T[1][0], T[1][1], T[1][2]};
+    T_ptr[out * 3 + 2] = {T[2][0], T[2][1], T[2][2]};
 
     // Compute center and radius
 	float2 point_image;
@@ -690,15 +711,52 @@ __global__ void project_gaussians_forward_kernel_2d(
         return;
     }
 
-    depths[idx] = p_view.z;
-    radii[idx] = (int)radius;
-    xys[idx] = point_image;
-    normal_opacity[idx] = {normal.x, normal.y, normal.z, opacities[idx]};;
-	num_tiles_hit[idx] = tile_area;
+    depths[out] = p_view.z;
+    radii[out] = (int)radius;
+    xys[out] = point_image;
+    float4 n_o = {normal.x, normal.y, normal.z, (float)opacities[idx]};
+    if (apply_sigmoid) {
+        // activate in registers rather than in a separate elementwise pass
+        n_o.x = 1.f / (1.f + __expf(-n_o.x));
+        n_o.y = 1.f / (1.f + __expf(-n_o.y));
+        n_o.z = 1.f / (1.f + __expf(-n_o.z));
+        n_o.w = 1.f / (1.f + __expf(-n_o.w));
+    }
+    normal_opacity[out] = n_o;
+	num_tiles_hit[out] = tile_area;
     // printf("%d num_tiles_hit %.2f \n", idx, num_tiles_hit);
 
 }
 
+#define INSTANTIATE_PROJECT_2D(T)                                              \
+    template __global__ void project_gaussians_forward_kernel_2d<T>(           \
+        const int num_points,                                                  \
+        const T* __restrict__ means3d,                                         \
+        const T* __restrict__ scales,                                          \
+        const float glob_scale,                                                \
+        const T* __restrict__ quats,                                           \
+        const T* __restrict__ opacities,                                       \
+        const float* __restrict__ viewmat,                                     \
+        const float* __restrict__ projmat,                                     \
+        const float4 intrins,                                                  \
+        const dim3 img_size,                                                   \
+        const dim3 tile_bounds,                                                \
+        const unsigned block_width,                                            \
+        const float clip_thresh,                                               \
+        const bool apply_sigmoid,                                              \
+        float2* __restrict__ xys,                                              \
+        float* __restrict__ depths,                                            \
+        float* __restrict__ transMats,                                         \
+        float4* __restrict__ normal_opacity,                                   \
+        int* __restrict__ radii,                                               \
+        int32_t* __restrict__ num_tiles_hit                                    \
+    );
+
+INSTANTIATE_PROJECT_2D(float)
+INSTANTIATE_PROJECT_2D(double)
+INSTANTIATE_PROJECT_2D(c10::Half)
+INSTANTIATE_PROJECT_2D(c10::BFloat16)
+
 __global__ void rasterize_forward_2d(
     const dim3 tile_bounds,
     const dim3 img_size,
@@ -25,13 +25,17 @@ __global__ void project_gaussians_forward_kernel(
 );
 
 
+// instantiated for T in {float, double, c10::Half, c10::BFloat16}
+// launched on a (gaussian blocks, cameras) grid; viewmat and projmat hold one
+// 4x4 matrix per camera and outputs are laid out camera-major
+template <typename T>
 __global__ void project_gaussians_forward_kernel_2d(
     const int num_points,
-    const float3* __restrict__ means3d,
-    const float3* __restrict__ scales,
+    const T* __restrict__ means3d,
+    const T* __restrict__ scales,
     const float glob_scale,
-    const float4* __restrict__ quats,
-    const float* opacities,
+    const T* __restrict__ quats,
+    const T* __restrict__ opacities,
     const float* __restrict__ viewmat,
     const float* __restrict__ projmat,
     const float4 intrins,
@@ -39,6 +43,7 @@ __global__ void project_gaussians_forward_kernel_2d(
     const dim3 tile_bounds,
     const unsigned block_width,
     const float clip_thresh,
+    const bool apply_sigmoid,
     float2* __restrict__ xys,
     float* __restrict__ depths,
     float* __restrict__ transMats,
@@ -9,6 +9,8 @@ from torch.autograd import Function
 
 import gsplat.cuda as _C
 
+from .utils import _contiguous
+
 
 def project_gaussians(
         means3d: Float[Tensor, "*batch 3"],
@@ -34,7 +36,7 @@ def project_gaussians(
        means3d (Tensor): xyzs of gaussians.
        scales (Tensor): scales of the gaussians.
        glob_scale (float): A global scaling factor applied to the scene.
-       quats (Tensor): rotations in normalized quaternion [w,x,y,z] format.
+       quats (Tensor): rotations in normalized quaternion [w,x,y,z] format. Normalization is not validated, since checking it would force a host-device sync on every call.
        viewmat (Tensor): view matrix for rendering.
        fx (float): focal length x.
        fy (float): focal length y.
@@ -57,13 +59,12 @@ def project_gaussians(
         - **cov3d** (Tensor): 3D covariances.
     """
     assert block_width > 1 and block_width <= 16, "block_width must be between 2 and 16"
-    assert (quats.norm(dim=-1) - 1 < 1e-6).all(), "quats must be normalized"
     return _ProjectGaussians.apply(
-        means3d.contiguous(),
-        scales.contiguous(),
+        _contiguous(means3d),
+        _contiguous(scales),
         glob_scale,
-        quats.contiguous(),
-        viewmat.contiguous(),
+        _contiguous(quats),
+        _contiguous(viewmat),
         fx,
         fy,
         cx,
@@ -193,7 +194,7 @@ class _ProjectGaussians(Function):
             v_compensation,
         )
 
-        if viewmat.requires_grad:
+        if ctx.needs_input_grad[4]:  # viewmat
             v_viewmat = torch.zeros_like(viewmat)
             R = viewmat[..., :3, :3]
 
@@ -216,17 +217,16 @@ class _ProjectGaussians(Function):
             #
             # Gradients for R and t can then be obtained by summing over
             # all the Gaussians.
-            v_mean3d_cam = torch.matmul(v_mean3d, R.transpose(-1, -2))
+            Rt = R.transpose(-1, -2).contiguous()
+            v_mean3d_cam = torch.matmul(v_mean3d, Rt)
 
             # gradient w.r.t. view matrix translation
             v_viewmat[..., :3, 3] = v_mean3d_cam.sum(-2)
 
             # gradent w.r.t. view matrix rotation
-            for j in range(3):
-                for l in range(3):
-                    v_viewmat[..., j, l] = torch.dot(
-                        v_mean3d_cam[..., j], means3d[..., l]
-                    )
+            v_viewmat[..., :3, :3] = torch.matmul(
+                v_mean3d_cam.transpose(-1, -2), means3d
+            )
         else:
             v_viewmat = None
 
@@ -267,8 +267,8 @@ def project_gaussians_2d(
         glob_scale: float,
         quats: Float[Tensor, "*batch 4"],
         opacity: Float[Tensor, "*batch 1"],
-        viewmat: Float[Tensor, "4 4"],
-        projmat: Float[Tensor, "4 4"],
+        viewmat: Float[Tensor, "*cameras 4 4"],
+        projmat: Float[Tensor, "*cameras 4 4"],
         fx: float,
         fy: float,
         cx: float,
@@ -276,20 +276,35 @@ def project_gaussians_2d(
         img_height: int,
         img_width: int,
         block_width: int,
-        clip_thresh: float = 0.01
+        clip_thresh: float = 0.01,
+        apply_sigmoid: bool = False,
 ) -> Tuple[Tensor, Tensor, Tensor, Tensor, Tensor, Tensor]:
     """This function projects 3D gaussians to 2D using the EWA splatting method for gaussian splatting.
 
     Note:
         This function is differentiable w.r.t the means3d, scales and quats inputs.
 
+    Note:
+        viewmat and projmat may also be stacks of B cameras of shape (B, 4, 4). The gaussians are then projected
+        into every camera in a single launch and each output gains a leading camera dimension of size B.
+
+    Note:
+        means3d, scales, quats and opacity may be float32, float16 or bfloat16 (all the same dtype).
+        They are converted to float32 inside the kernel, so reduced precision only halves the bytes read.
+
+    Note:
+        The outputs are views into two buffers shared by all of them (one float, one int), so keeping any
+        output alive keeps the whole buffer alive. They must not be modified in place; autograd rejects
+        in-place updates of views created inside a custom Function. Clone an output before writing to it.
+
     Args:
        means3d (Tensor): xyzs of gaussians.
        scales (Tensor): scales of the gaussians.
        glob_scale (float): A global scaling factor applied to the scene.
        quats (Tensor): rotations in normalized quaternion [w,x,y,z] format.
+       opacity (Tensor): opacities of the gaussians.
        viewmat (Tensor): view matrix for rendering.
-       projwmat (Tensor): proj matrix for rendering.
+       projmat (Tensor): full world-to-NDC projection matrix for rendering, i.e. the view and projection matrices already combined (``viewmat.T @ proj.T``). It is used as-is and not multiplied with viewmat.
        fx (float): focal length x.
        fy (float): focal length y.
        cx (float): principal point x.
@@ -298,6 +313,7 @@ def project_gaussians_2d(
        img_width (int): width of the rendered image.
        block_width (int): side length of tiles inside projection/rasterization in pixels (always square). 16 is a good default value, must be between 2 and 16 inclusive.
        clip_thresh (float): minimum z depth threshold.
+       apply_sigmoid (bool): apply a sigmoid to the normal and opacity channels before they are written out.
 
     Returns:
         A tuple of {Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor}:
@@ -305,20 +321,20 @@ def project_gaussians_2d(
         - **xys** (Tensor): x,y locations of 2D gaussian projections.
         - **depths** (Tensor): z depth of gaussians.
         - **transMats** (Tensor):
-        - **normal** (Tensor):
+        - **normal** (Tensor): normal xyz and opacity of each gaussian, activated when apply_sigmoid is set.
         - **radii** (Tensor): radii of 2D gaussian projections.
         - **num_tiles_hit** (Tensor): number of tiles hit per gaussian.
     """
     assert block_width > 1 and block_width <= 16, "block_width must be between 2 and 16"
     # assert (quats.norm(dim=-1) - 1 < 1e-6).all(), "quats must be normalized"
     return _ProjectGaussians_2d.apply(
-        means3d.contiguous(),
-        scales.contiguous(),
+        _contiguous(means3d),
+        _contiguous(scales),
         glob_scale,
-        quats.contiguous(),
-        opacity.contiguous(),
-        viewmat.contiguous(),
-        projmat.contiguous(),
+        _contiguous(quats),
+        _contiguous(opacity),
+        _contiguous(viewmat),
+        _contiguous(projmat),
         fx,
         fy,
         cx,
@@ -327,6 +343,7 @@ def project_gaussians_2d(
         img_width,
         block_width,
         clip_thresh,
+        apply_sigmoid,
     )
 
 
@@ -341,8 +358,8 @@ class _ProjectGaussians_2d(Function):
             glob_scale: float,
             quats: Float[Tensor, "*batch 4"],
             opacity: Float[Tensor, "*batch 1"],
-            viewmat: Float[Tensor, "4 4"],
-            projwmat: Float[Tensor, "4 4"],
+            viewmat: Float[Tensor, "*cameras 4 4"],
+            projwmat: Float[Tensor, "*cameras 4 4"],
             fx: float,
             fy: float,
             cx: float,
@@ -350,7 +367,8 @@ class _ProjectGaussians_2d(Function):
             img_height: int,
             img_width: int,
             block_width: int,
-            clip_thresh: float = 0.01
+            clip_thresh: float = 0.01,
+            apply_sigmoid: bool = False,
     ):
         num_points = means3d.shape[-2]
         if num_points < 1 or means3d.shape[-1] != 3:
@@ -380,6 +398,7 @@ class _ProjectGaussians_2d(Function):
             img_width,
             block_width,
             clip_thresh,
+            apply_sigmoid,
         )
 
         # Save non-tensors.
@@ -391,6 +410,7 @@ class _ProjectGaussians_2d(Function):
         ctx.fy = fy
         ctx.cx = cx
         ctx.cy = cy
+        ctx.apply_sigmoid = apply_sigmoid
         # Save tensors.
         ctx.save_for_backward(
             means3d,
@@ -406,12 +426,12 @@ class _ProjectGaussians_2d(Function):
         return xys, depths, transMats, normal, radii, num_tiles_hit
     @staticmethod
     def backward(ctx,
-                 xys,
-                 depths,
-                 transMats,
-                 normal,
-                 radii,
-                 num_tiles_hit):
+                 v_xys,
+                 v_depths,
+                 v_transMats,
+                 v_normal,
+                 v_radii,
+                 v_num_tiles_hit):
         (
             means3d,
             scales,
@@ -422,6 +442,17 @@ class _ProjectGaussians_2d(Function):
             radii,
             normal,
         ) = ctx.saved_tensors
+        # the backward kernel works in float32, whatever the input precision;
+        # autograd casts the returned gradients back to the input dtype
+        means3d = means3d.float()
+        scales = scales.float()
+        quats = quats.float()
+        if ctx.apply_sigmoid:
+            # the forward kernel returned sigmoid(x); chain through s * (1 - s)
+            v_normal = v_normal * normal * (1 - normal)
+        v_opacity = v_normal[..., 3:4]
+        # the backward kernel reads the normal gradient as packed float3
+        v_normal = v_normal[..., :3].float().contiguous()
         # cuda
         # print("means3d shape:", means3d.shape, "type:", type(means3d), "dtype:", means3d.dtype)
         # print("transMats shape:", transMats.shape, "type:", type(transMats), "dtype:", transMats.dtype)
@@ -431,33 +462,39 @@ class _ProjectGaussians_2d(Function):
         # print("projwmat shape:", projwmat.shape, "type:", type(projwmat), "dtype:", projwmat.dtype)
         # print("radii shape:", radii.shape, "type:", type(radii), "dtype:", radii.dtype)
         # print("dL_dnormal3Ds shape:", dL_dnormal3Ds.shape, "type:", type(dL_dnormal3Ds), "dtype:", dL_dnormal3Ds.dtype)
-        (dL_dtransMats,
-         dL_dmean2Ds,
-         dL_dmean3Ds,
-         dL_dscales,
-         dL_drots) = _C.project_gaussians_backward_2d(
-            ctx.num_points,
-            means3d,
-            transMats,
-            scales,
-            ctx.glob_scale,
-            quats,
-            viewmat,
-            projwmat,
-            ctx.img_height,
-            ctx.img_width,
-            radii,
-            normal
-        )
-        # debug
-        print("project bp1")
-        print("Shape and type of dL_dtransMats:", dL_dtransMats.shape, type(dL_dtransMats))
-        print("Shape and type of dL_dmean2Ds:", dL_dmean2Ds.shape, type(dL_dmean2Ds))
-        print("Shape and type of dL_dmean3Ds:", dL_dmean3Ds.shape, type(dL_dmean3Ds))
-        print("Shape and type of dL_dscales:", dL_dscales.shape, type(dL_dscales))
-        print("Shape and type of dL_drots:", dL_drots.shape, type(dL_drots))
-
-        if viewmat.requires_grad:
+        def backward_one(transMats, viewmat, projwmat, radii, v_normal):
+            return _C.project_gaussians_backward_2d(
+                ctx.num_points,
+                means3d,
+                transMats,
+                scales,
+                ctx.glob_scale,
+                quats,
+                viewmat,
+                projwmat,
+                ctx.img_height,
+                ctx.img_width,
+                radii,
+                v_normal
+            )[2:5]
+
+        # the backward kernel handles one camera at a time
+        batched = viewmat.dim() == 3
+        if batched:
+            grads = [
+                backward_one(*args)
+                for args in zip(transMats, viewmat, projwmat, radii, v_normal)
+            ]
+            # (B, N, ...) per-camera gradients of the gaussian parameters
+            dL_dmean3Ds, dL_dscales, dL_drots = (
+                torch.stack(g) for g in zip(*grads)
+            )
+        else:
+            dL_dmean3Ds, dL_dscales, dL_drots = backward_one(
+                transMats, viewmat, projwmat, radii, v_normal
+            )
+
+        if ctx.needs_input_grad[5]:  # viewmat
             v_viewmat = torch.zeros_like(viewmat)
             R = viewmat[..., :3, :3]
 
@@ -480,21 +517,26 @@ class _ProjectGaussians_2d(Function):
             #
             # Gradients for R and t can then be obtained by summing over
             # all the Gaussians.
-            v_mean3d_cam = torch.matmul(dL_dmean3Ds, R.transpose(-1, -2))
+            Rt = R.transpose(-1, -2).contiguous()
+            v_mean3d_cam = torch.matmul(dL_dmean3Ds, Rt)
 
             # gradient w.r.t. view matrix translation
             v_viewmat[..., :3, 3] = v_mean3d_cam.sum(-2)
 
             # gradent w.r.t. view matrix rotation
-            for j in range(3):
-                for l in range(3):
-                    v_viewmat[..., j, l] = torch.dot(
-                        v_mean3d_cam[..., j], means3d[..., l]
-                    )
+            v_viewmat[..., :3, :3] = torch.matmul(
+                v_mean3d_cam.transpose(-1, -2), means3d
+            )
         else:
             v_viewmat = None
 
-        dL_dscales = torch.concatenate((dL_dscales, torch.zeros((dL_dscales.shape[0], 1), device="cuda:0")), dim=-1)
+        if batched:
+            # every camera sees the same gaussians, so their gradients add up
+            dL_dmean3Ds = dL_dmean3Ds.sum(0)
+            dL_dscales = dL_dscales.sum(0)
+            dL_drots = dL_drots.sum(0)
+            v_opacity = v_opacity.sum(0)
+
         # pdb.set_trace()
         # Return a gradient for each input.
         # print(v_mean3d)
@@ -509,8 +551,8 @@ class _ProjectGaussians_2d(Function):
             None,
             # quats: Float[Tensor, "*batch 4"],
             dL_drots,
-            # normal
-            None,
+            # opacity: Float[Tensor, "*batch 1"],
+            v_opacity,
             # viewmat: Float[Tensor, "4 4"],
             v_viewmat,
             # proj
@@ -530,5 +572,7 @@ class _ProjectGaussians_2d(Function):
             # block_width: int,
             None,
             # clip_thresh,
-            None
+            None,
+            # apply_sigmoid: bool,
+            None,
         )
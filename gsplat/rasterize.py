@@ -1,6 +1,7 @@
 """Python bindings for custom Cuda functions"""
 
-from typing import Optional, Tuple, Any, Union
+from functools import lru_cache
+from typing import Optional, Tuple, Union
 
 import torch
 from jaxtyping import Float, Int
@@ -9,7 +10,72 @@ from torch.autograd import Function
 
 import gsplat.cuda as _C
 
-from .utils import bin_and_sort_gaussians, compute_cumulative_intersects
+from .utils import _contiguous, bin_and_sort_gaussians, compute_cumulative_intersects
+
+
+@lru_cache(maxsize=None)
+def _default_background(channels: int, device: torch.device, dtype: torch.dtype) -> Tensor:
+    """White background shared by every call that does not pass one; it is never written to."""
+    # built once per (channels, device, dtype) with a single fill on the device;
+    # a tensor created under inference mode could not be saved for backward
+    # later, so the cached one is always a normal tensor
+    with torch.inference_mode(False):
+        return torch.full((channels,), 1.0, dtype=dtype, device=device).requires_grad_(False)
+
+
+@lru_cache(maxsize=16)
+def _launch_config(
+        img_height: int, img_width: int, block_width: int
+) -> Tuple[Tuple[int, int, int], Tuple[int, int, int], Tuple[int, int, int]]:
+    """Tile grid, block and image sizes passed to the rasterize kernels."""
+    tile_bounds = (
+        (img_width + block_width - 1) // block_width,
+        (img_height + block_width - 1) // block_width,
+        1,
+    )
+    block = (block_width, block_width, 1)
+    img_size = (img_width, img_height, 1)
+    return tile_bounds, block, img_size
+
+
+@lru_cache(maxsize=None)
+def _side_stream(device: torch.device) -> torch.cuda.Stream:
+    """Stream for small reductions that can overlap the rasterize backward kernel."""
+    return torch.cuda.Stream(device=device)
+
+
+def _background_grad(v_out_img: Tensor, final_Ts: Tensor) -> Tensor:
+    """Launches the background gradient on the side stream; wait on that stream before using it."""
+    stream = _side_stream(v_out_img.device)
+    stream.wait_stream(torch.cuda.current_stream())
+    with torch.cuda.stream(stream):
+        # one reduction over the image; only the transmittance is cast, and
+        # only if the incoming gradient is not float32
+        v_background = torch.einsum(
+            "hwc,hw->c", v_out_img, final_Ts.to(v_out_img.dtype)
+        )
+    # inputs are shared with the main stream and the result is consumed there
+    v_out_img.record_stream(stream)
+    final_Ts.record_stream(stream)
+    v_background.record_stream(torch.cuda.current_stream())
+    return v_background
+
+
+def _validate_rasterize_inputs(
+        xys: Tensor, colors: Tensor, block_width: int, background: Optional[Tensor]
+) -> None:
+    """Shared argument checks of the rasterize entry points, raising ValueError on bad input."""
+    if not 1 < block_width <= 16:
+        raise ValueError(f"block_width must be between 2 and 16, got {block_width}")
+    if xys.dim() != 2 or xys.shape[1] != 2:
+        raise ValueError(f"xys must have dimensions (N, 2), got {tuple(xys.shape)}")
+    if colors.dim() != 2:
+        raise ValueError(f"colors must have dimensions (N, D), got {tuple(colors.shape)}")
+    if background is not None and background.shape[0] != colors.shape[-1]:
+        raise ValueError(
+            f"incorrect shape of background color tensor, expected shape {colors.shape[-1]}, "
+            f"got {tuple(background.shape)}"
+        )
 
 
 def rasterize_gaussians(
@@ -51,44 +117,38 @@ def rasterize_gaussians(
         - **out_img** (Tensor): N-dimensional rendered output image.
         - **out_alpha** (Optional[Tensor]): Alpha channel of the rendered output image.
     """
-    assert block_width > 1 and block_width <= 16, "block_width must be between 2 and 16"
+    _validate_rasterize_inputs(xys, colors, block_width, background)
     if colors.dtype == torch.uint8:
-        # make sure colors are float [0,1]
-        colors = colors.float() / 255
-
-    if background is not None:
-        assert (
-                background.shape[0] == colors.shape[-1]
-        ), f"incorrect shape of background color tensor, expected shape {colors.shape[-1]}"
-    else:
-        background = torch.ones(
-            colors.shape[-1], dtype=torch.float32, device=colors.device
-        )
-
-    if xys.ndimension() != 2 or xys.size(1) != 2:
-        raise ValueError("xys must have dimensions (N, 2)")
+        # make sure colors are float [0,1]; true division promotes uint8 to
+        # float32 in a single kernel, without a float copy in between
+        colors = colors / 255
 
-    if colors.ndimension() != 2:
-        raise ValueError("colors must have dimensions (N, D)")
+    if background is None:
+        background = _default_background(colors.size(-1), colors.device, torch.float32)
 
     return _RasterizeGaussians.apply(
-        xys.contiguous(),
-        depths.contiguous(),
-        radii.contiguous(),
-        conics.contiguous(),
-        num_tiles_hit.contiguous(),
-        colors.contiguous(),
-        opacity.contiguous(),
+        _contiguous(xys),
+        _contiguous(depths),
+        _contiguous(radii),
+        _contiguous(conics),
+        _contiguous(num_tiles_hit),
+        _contiguous(colors),
+        _contiguous(opacity),
         img_height,
         img_width,
         block_width,
-        background.contiguous(),
+        _contiguous(background),
         return_alpha,
     )
 
 
 class _RasterizeGaussians(Function):
-    """Rasterizes 2D gaussians"""
+    """Rasterizes 2D gaussians.
+
+    Shared by both entry points: when ``transMats`` is given the gaussians are 2D surfels rasterized by the
+    2DGS kernels and ``opacity`` holds the packed normal and opacity, otherwise they are splats described by
+    ``conics``.
+    """
 
     @staticmethod
     def forward(
@@ -96,7 +156,7 @@ class _RasterizeGaussians(Function):
             xys: Float[Tensor, "*batch 2"],
             depths: Float[Tensor, "*batch 1"],
             radii: Float[Tensor, "*batch 1"],
-            conics: Float[Tensor, "*batch 3"],
+            conics: Optional[Float[Tensor, "*batch 3"]],
             num_tiles_hit: Int[Tensor, "*batch 1"],
             colors: Float[Tensor, "*batch channels"],
             opacity: Float[Tensor, "*batch 1"],
@@ -105,36 +165,31 @@ class _RasterizeGaussians(Function):
             block_width: int,
             background: Float[Tensor, "channels"],
             return_alpha: Optional[bool] = False,
-    ) -> Tensor:
+            transMats: Optional[Float[Tensor, "*batch 3 3"]] = None,
+    ) -> Union[Tensor, Tuple[Tensor, Tensor]]:
         num_points = xys.size(0)
-        tile_bounds = (
-            (img_width + block_width - 1) // block_width,
-            (img_height + block_width - 1) // block_width,
-            1,
-        )
-        block = (block_width, block_width, 1)
-        img_size = (img_width, img_height, 1)
+        num_channels = colors.size(-1)
+        tile_bounds, block, img_size = _launch_config(img_height, img_width, block_width)
 
         num_intersects, cum_tiles_hit = compute_cumulative_intersects(num_tiles_hit)
 
         if num_intersects < 1:
-            out_img = (
-                    torch.ones(img_height, img_width, colors.shape[-1], device=xys.device)
-                    * background
-            )
+            # nothing to draw: a single copy of the broadcast background color
+            out_img = background.view(1, 1, -1).expand(
+                img_height, img_width, num_channels
+            ).clone()
             gaussian_ids_sorted = torch.zeros(0, 1, device=xys.device)
             tile_bins = torch.zeros(0, 2, device=xys.device)
             final_Ts = torch.zeros(img_height, img_width, device=xys.device)
-            final_idx = torch.zeros(img_height, img_width, device=xys.device)
+            # only saved for backward, which skips the kernel when nothing was drawn
+            final_idx = torch.empty(img_height, img_width, device=xys.device)
+            if transMats is not None:
+                # same layout as the auxiliary buffer of rasterize_forward_2d
+                other = torch.zeros(
+                    3 + 3 + 1, img_height, img_width, device=xys.device
+                )
         else:
-
-            (
-                isect_ids_unsorted,
-                gaussian_ids_unsorted,
-                isect_ids_sorted,
-                gaussian_ids_sorted,
-                tile_bins,
-            ) = bin_and_sort_gaussians(
+            gaussian_ids_sorted, tile_bins = bin_and_sort_gaussians(
                 num_points,
                 num_intersects,
                 xys,
@@ -143,35 +198,46 @@ class _RasterizeGaussians(Function):
                 cum_tiles_hit,
                 tile_bounds,
                 block_width,
+                return_intermediates=False,
             )
 
-            if colors.shape[-1] == 3:
-                rasterize_fn = _C.rasterize_forward
+            if transMats is not None:
+                out_img, final_Ts, final_idx, other = _C.rasterize_forward_2d(
+                    tile_bounds,
+                    block,
+                    img_size,
+                    gaussian_ids_sorted,
+                    tile_bins,
+                    xys,
+                    transMats,
+                    colors,
+                    opacity,
+                    background,
+                )
             else:
-                rasterize_fn = _C.nd_rasterize_forward
-
-            out_img, final_Ts, final_idx = rasterize_fn(
-                tile_bounds,
-                block,
-                img_size,
-                gaussian_ids_sorted,
-                tile_bins,
-                xys,
-                conics,
-                colors,
-                opacity,
-                background,
-            )
-
-        ctx.img_width = img_width
-        ctx.img_height = img_height
-        ctx.num_intersects = num_intersects
-        ctx.block_width = block_width
+                # the extension picks the RGB or N-channel kernel itself
+                out_img, final_Ts, final_idx = _C.rasterize_forward(
+                    tile_bounds,
+                    block,
+                    img_size,
+                    gaussian_ids_sorted,
+                    tile_bins,
+                    xys,
+                    conics,
+                    colors,
+                    opacity,
+                    background,
+                )
+
+        ctx.cfg = (img_width, img_height, num_channels, num_intersects, block_width)
+        # unused outputs get None grads instead of autograd-allocated zeros
+        ctx.set_materialize_grads(False)
         ctx.save_for_backward(
             gaussian_ids_sorted,
             tile_bins,
             xys,
             conics,
+            transMats,
             colors,
             opacity,
             background,
@@ -179,6 +245,12 @@ class _RasterizeGaussians(Function):
             final_idx
         )
 
+        if transMats is not None:
+            # rasterize_gaussians_2d returns its auxiliary buffer only when
+            # return_alpha is False
+            if return_alpha:
+                return out_img
+            return out_img, other
         if return_alpha:
             out_alpha = 1 - final_Ts
             return out_img, out_alpha
@@ -187,19 +259,14 @@ class _RasterizeGaussians(Function):
 
     @staticmethod
     def backward(ctx, v_out_img, v_out_alpha=None):
-        img_height = ctx.img_height
-        img_width = ctx.img_width
-        num_intersects = ctx.num_intersects
-        print("project bp2")
-
-        if v_out_alpha is None:
-            v_out_alpha = torch.zeros_like(v_out_img[..., 0])
+        img_width, img_height, num_channels, num_intersects, block_width = ctx.cfg
 
         (
             gaussian_ids_sorted,
             tile_bins,
             xys,
             conics,
+            transMats,
             colors,
             opacity,
             background,
@@ -207,22 +274,62 @@ class _RasterizeGaussians(Function):
             final_idx,
         ) = ctx.saved_tensors
 
-        if num_intersects < 1:
-            v_xy = torch.zeros_like(xys)
-            v_xy_abs = torch.zeros_like(xys)
-            v_conic = torch.zeros_like(conics)
-            v_colors = torch.zeros_like(colors)
-            v_opacity = torch.zeros_like(opacity)
+        if v_out_img is None:
+            v_out_img = torch.zeros(
+                img_height, img_width, num_channels, device=xys.device
+            )
+        if v_out_alpha is None:
+            if transMats is not None:
+                # the 2D kernel reads the gradient of the whole auxiliary buffer
+                v_out_alpha = torch.zeros(
+                    3 + 3 + 1, img_height, img_width, device=xys.device
+                )
+            else:
+                v_out_alpha = torch.zeros_like(v_out_img[..., 0])
+
+        # the background gradient does not depend on the rasterize backward,
+        # so it runs concurrently with it
+        v_background = None
+        if background.requires_grad:
+            # the 2D kernels keep the transmittance in the first (H, W) plane
+            # of final_Ts, followed by auxiliary render outputs
+            transmittance = final_Ts.view(-1)[: img_height * img_width].view(
+                img_height, img_width
+            )
+            v_background = _background_grad(v_out_img, transmittance)
 
+        v_xy_abs = None
+        v_conic = v_transMats = None
+        if num_intersects < 1:
+            # nothing was drawn, so no gaussian receives a gradient; autograd
+            # treats None as zero
+            v_xy = v_colors = v_opacity = None
+            if transMats is None:
+                v_xy_abs = torch.zeros_like(xys)
+        elif transMats is not None:
+            v_transMats, v_xy, v_opacity, v_colors = _C.rasterize_backward_2d(
+                img_height,
+                img_width,
+                block_width,
+                gaussian_ids_sorted,
+                tile_bins,
+                xys,
+                opacity,
+                transMats,
+                colors,
+                background,
+                final_Ts,
+                final_idx,
+                v_out_img,
+                v_out_alpha
+            )
+            # the kernel writes flat rows of 9
+            v_transMats = v_transMats.view_as(transMats)
         else:
-            if colors.shape[-1] == 3:
-                rasterize_fn = _C.rasterize_backward
-            else:
-                rasterize_fn = _C.nd_rasterize_backward
-            v_xy, v_xy_abs, v_conic, v_colors, v_opacity = rasterize_fn(
+            v_xy, v_xy_abs, v_conic, v_colors, v_opacity = _C.rasterize_backward(
                 img_height,
                 img_width,
-                ctx.block_width,
+                block_width,
                 gaussian_ids_sorted,
                 tile_bins,
                 xys,
@@ -235,16 +342,14 @@ class _RasterizeGaussians(Function):
                 v_out_img,
                 v_out_alpha,
             )
-        v_background = None
-        if background.requires_grad:
-            v_background = torch.matmul(
-                v_out_img.float().view(-1, 3).t(), final_Ts.float().view(-1, 1)
-            ).squeeze()
+        if v_background is not None:
+            torch.cuda.current_stream().wait_stream(_side_stream(xys.device))
 
-        # Abs grad for gaussian splitting criterion. See
-        # - "AbsGS: Recovering Fine Details for 3D Gaussian Splatting"
-        # - "EfficientGS: Streamlining Gaussian Splatting for Large-Scale High-Resolution Scene Representation"
-        xys.absgrad = v_xy_abs
+        if v_xy_abs is not None:
+            # Abs grad for gaussian splitting criterion. See
+            # - "AbsGS: Recovering Fine Details for 3D Gaussian Splatting"
+            # - "EfficientGS: Streamlining Gaussian Splatting for Large-Scale High-Resolution Scene Representation"
+            xys.absgrad = v_xy_abs
 
         return (
             v_xy,  # xys
@@ -259,6 +364,7 @@ class _RasterizeGaussians(Function):
             None,  # block_width
             v_background,  # background
             None,  # return_alpha
+            v_transMats,  # transMats
         )
 
 
@@ -276,209 +382,27 @@ def rasterize_gaussians_2d(
         background: Optional[Float[Tensor, "channels"]] = None,
         return_alpha: Optional[bool] = True,
 ) -> Tensor:
-    assert block_width > 1 and block_width <= 16, "block_width must be between 2 and 16"
+    _validate_rasterize_inputs(xys, colors, block_width, background)
     if colors.dtype == torch.uint8:
-        # make sure colors are float [0,1]
-        colors = colors.float() / 255
-
-    if background is not None:
-        assert (
-                background.shape[0] == colors.shape[-1]
-        ), f"incorrect shape of background color tensor, expected shape {colors.shape[-1]}"
-    else:
-        background = torch.ones(
-            colors.shape[-1], dtype=torch.float32, device=colors.device
-        )
+        # make sure colors are float [0,1]; true division promotes uint8 to
+        # float32 in a single kernel, without a float copy in between
+        colors = colors / 255
+
+    if background is None:
+        background = _default_background(colors.size(-1), colors.device, torch.float32)
 
-    if xys.ndimension() != 2 or xys.size(1) != 2:
-        print(xys.shape)
-        raise ValueError("xys must have dimensions (N, 2)")
-    #
-    if colors.ndimension() != 2:
-        print(colors.shape)
-        raise ValueError("colors must have dimensions (N, D)")
-
-    return _RasterizeGaussians_2d.apply(
-        xys.contiguous(),
-        radii.contiguous(),
-        depths.contiguous(),
-        transMats.contiguous(),
-        num_tiles_hit.contiguous(),
-        colors.contiguous(),
-        normal_opacity.contiguous(),
+    return _RasterizeGaussians.apply(
+        _contiguous(xys),
+        _contiguous(depths),
+        _contiguous(radii),
+        None,  # conics
+        _contiguous(num_tiles_hit),
+        _contiguous(colors),
+        _contiguous(normal_opacity),
         img_height,
         img_width,
         block_width,
-        background.contiguous(),
+        _contiguous(background),
         return_alpha,
+        _contiguous(transMats),
     )
-
-
-class _RasterizeGaussians_2d(Function):
-    """Rasterizes 2D gaussians"""
-
-    @staticmethod
-    def forward(
-            ctx,
-            xys: Float[Tensor, "*batch 2"],
-            radii: Int[Tensor, "*batch 1"],
-            depths: Float[Tensor, "*batch 1"],
-            transMats: Float[Tensor, "*batch 3"],
-            num_tiles_hit: Int[Tensor, "*batch 1"],
-            colors: Float[Tensor, "*batch channels"],
-            normal_opacity: Float[Tensor, "*batch 1"],
-            img_height: int,
-            img_width: int,
-            block_width: int,
-            background: Float[Tensor, "channels"],
-            return_alpha: Optional[bool] = True,
-    ) -> Tuple[Any, Union[Tensor, Any]]:
-        num_points = xys.size(0)
-
-        tile_bounds = (
-            (img_width + block_width - 1) // block_width,
-            (img_height + block_width - 1) // block_width,
-            1,
-        )
-        block = (block_width, block_width, 1)
-        img_size = (img_width, img_height, 1)
-
-        num_intersects, cum_tiles_hit = compute_cumulative_intersects(num_tiles_hit)
-
-        if num_intersects < 1:
-            out_img = (
-                    torch.ones(img_height, img_width, colors.shape[-1], device=xys.device)
-                    * background
-            )
-            gaussian_ids_sorted = torch.zeros(0, 1, device=xys.device)
-            tile_bins = torch.zeros(0, 2, device=xys.device)
-            final_T = torch.zeros(img_height, img_width, device=xys.device)
-            final_idx = torch.zeros(img_height, img_width, device=xys.device)
-        else:
-            (
-                isect_ids_unsorted,
-                gaussian_ids_unsorted,
-                isect_ids_sorted,
-                gaussian_ids_sorted,
-                tile_bins,
-            ) = bin_and_sort_gaussians(
-                num_points,
-                num_intersects,
-                xys,
-                depths,
-                radii,
-                cum_tiles_hit,
-                tile_bounds,
-                block_width,
-            )
-            if colors.shape[-1] == 3:
-                rasterize_fn = _C.rasterize_forward_2d
-            else:
-                rasterize_fn = _C.rasterize_forward_2d
-            out_img, final_T, final_idx, other = rasterize_fn(
-                tile_bounds,
-                block,
-                img_size,
-                gaussian_ids_sorted,
-                tile_bins,
-                xys,
-                transMats,
-                colors,
-                normal_opacity,
-                background,
-            )
-            # print(other[1:2])
-        ctx.img_width = img_width
-        ctx.img_height = img_height
-        ctx.num_intersects = num_intersects
-        ctx.block_width = block_width
-        
-        ctx.save_for_backward(
-            gaussian_ids_sorted,
-            tile_bins,
-            xys,
-            normal_opacity,
-            transMats,
-            colors,
-            background,
-            final_T,
-            final_idx,
-        )
-
-        if return_alpha:
-            return out_img
-        else:
-            return out_img, other
-
-    @staticmethod
-    def backward(ctx, v_out_img, v_out_alpha):
-        img_height = ctx.img_height
-        img_width = ctx.img_width
-        num_intersects = ctx.num_intersects
-        print(v_out_alpha.shape)
-        if v_out_alpha is None:
-            v_out_alpha = torch.zeros_like(v_out_img[..., 0])
-
-        (
-            gaussian_ids_sorted,
-            tile_bins,
-            xys,
-            transMats,
-            colors,
-            normal_opacity,
-            background,
-            final_T,
-            final_idx,
-        ) = ctx.saved_tensors
-
-        if num_intersects < 1:
-            v_xy = torch.zeros_like(xys)
-            v_normal_opacity = torch.zeros_like(normal_opacity)
-            v_transMats = torch.zeros_like(transMats)
-            v_colors = torch.zeros_like(colors)
-        else:
-            # if colors.shape[-1] == 3:
-            rasterize_fn = _C.rasterize_backward_2d
-            v_transMats, v_xy, v_normal_opacity, v_colors = rasterize_fn(
-                img_height,
-                img_width,
-                ctx.block_width,
-                gaussian_ids_sorted,
-                tile_bins,
-                xys,
-                normal_opacity,
-                transMats,
-                colors,
-                background,
-                final_T,
-                final_idx,
-                v_out_img,
-                v_out_alpha
-            )
-        # Debug: Print shapes after calling rasterize_fn
-        print("Shapes after rasterize_fn:")
-        print("v_transMats shape:", v_transMats.shape)
-        print("v_xy shape:", v_xy.shape)
-        print("v_normal_opacity shape:", v_normal_opacity.shape)
-        print("v_colors shape:", v_colors.shape)
-
-        v_background = None
-        if background.requires_grad:
-            v_background = torch.matmul(
-                v_out_img.float().view(-1, 3).t(), final_T.float().view(-1, 1)
-            ).squeeze()
-
-        return (
-            v_xy,  # xys
-            v_transMats,  # transMats
-            None,  # depths
-            None,  # radii
-            None,  # num_tiles_hit
-            v_colors,  # colors
-            v_normal_opacity,  # normal opacity
-            None,  # img_height
-            None,  # img_width
-            None,  # block_width
-            v_background,  # background
-            None,  # return_alpha
-        )
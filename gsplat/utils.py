@@ -1,6 +1,6 @@
 """Python bindings for binning and sorting gaussians"""
 
-from typing import Tuple
+from typing import Tuple, Union
 
 import torch
 from jaxtyping import Float, Int
@@ -111,6 +111,11 @@ def compute_cumulative_intersects(
     Note:
         This function is not differentiable to any input.
 
+    Note:
+        Reading num_intersects back to the host synchronizes with the device. This sync is required: the
+        intersection and sort buffers in bin_and_sort_gaussians are sized by num_intersects, so it has to be
+        known on the host before they can be allocated.
+
     Args:
         num_tiles_hit (Tensor): number of intersected tiles per gaussian.
 
@@ -134,12 +139,16 @@ def bin_and_sort_gaussians(
     cum_tiles_hit: Float[Tensor, "batch 1"],
     tile_bounds: Tuple[int, int, int],
     block_size: int,
-) -> Tuple[
-    Float[Tensor, "num_intersects 1"],
-    Float[Tensor, "num_intersects 1"],
-    Float[Tensor, "num_intersects 1"],
-    Float[Tensor, "num_intersects 1"],
-    Float[Tensor, "num_intersects 2"],
+    return_intermediates: bool = True,
+) -> Union[
+    Tuple[
+        Float[Tensor, "num_intersects 1"],
+        Float[Tensor, "num_intersects 1"],
+        Float[Tensor, "num_intersects 1"],
+        Float[Tensor, "num_intersects 1"],
+        Float[Tensor, "num_intersects 2"],
+    ],
+    Tuple[Float[Tensor, "num_intersects 1"], Float[Tensor, "num_intersects 2"]],
 ]:
     """Mapping gaussians to sorted unique intersection IDs and tile bins used for fast rasterization.
 
@@ -156,6 +165,8 @@ def bin_and_sort_gaussians(
         radii (Tensor): radii of 2D gaussian projections.
         cum_tiles_hit (Tensor): list of cumulative tiles hit.
         tile_bounds (Tuple): tile dimensions as a len 3 tuple (tiles.x , tiles.y, 1).
+        return_intermediates (bool): also return the unsorted IDs and the sorted intersect IDs. When False only
+            (gaussian_ids_sorted, tile_bins) is returned and the other buffers are released on return.
 
     Returns:
         A tuple of {Tensor, Tensor, Tensor, Tensor, Tensor}:
@@ -198,4 +209,11 @@ def bin_and_sort_gaussians(
     # print("After get_tile_bin_edges:")
     # print("tile_bins:", tile_bins)
     # print("tile_bins shape:", tile_bins.shape)
+    if not return_intermediates:
+        return gaussian_ids_sorted, tile_bins
     return isect_ids, gaussian_ids, isect_ids_sorted, gaussian_ids_sorted, tile_bins
+
+
+def _contiguous(x: Tensor) -> Tensor:
+    """Returns `x` itself when it is already contiguous, else a contiguous copy."""
+    return x if x.is_contiguous() else x.contiguous()
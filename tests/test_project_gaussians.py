@@ -4,7 +4,7 @@ import torch
 from torch.func import vjp  # type: ignore
 
 from gsplat import _torch_impl
-from gsplat.project_gaussians import project_gaussians
+from gsplat.project_gaussians import project_gaussians, project_gaussians_2d
 import gsplat.cuda as _C
 
 torch.manual_seed(42)
@@ -289,6 +289,122 @@ def test_project_gaussians_backward():
     print("passed project_gaussians_backward test")
 
 
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
+def test_project_gaussians_viewmat_grad():
+    num_points = 100
+
+    means3d = torch.randn((num_points, 3), device=device, requires_grad=True)
+    scales = torch.rand((num_points, 3), device=device) + 0.2
+    glob_scale = 0.1
+    quats = torch.randn((num_points, 4), device=device)
+    quats /= torch.linalg.norm(quats, dim=-1, keepdim=True)
+
+    H, W = 512, 512
+    cx, cy = W / 2, H / 2
+    fx, fy = W / 2, W / 2
+    viewmat = torch.tensor(
+        [
+            [1.0, 0.0, 0.0, 0.0],
+            [0.0, 1.0, 0.0, 0.0],
+            [0.0, 0.0, 1.0, 8.0],
+            [0.0, 0.0, 0.0, 1.0],
+        ],
+        device=device,
+    )
+    viewmat[:3, :3] = _torch_impl.quat_to_rotmat(torch.randn(4))
+    viewmat.requires_grad = True
+
+    xys, depths, _, conics, _, _, _ = project_gaussians(
+        means3d, scales, glob_scale, quats, viewmat, fx, fy, cx, cy, H, W, 16
+    )
+    (xys.sum() + depths.sum() + conics.sum()).backward()
+
+    # reference: per-entry dot products of the camera-space mean gradients
+    v_mean3d_cam = means3d.grad @ viewmat[:3, :3].detach().T
+    _v_viewmat = torch.zeros_like(viewmat)
+    _v_viewmat[:3, 3] = v_mean3d_cam.sum(0)
+    for j in range(3):
+        for l in range(3):
+            _v_viewmat[j, l] = torch.dot(v_mean3d_cam[:, j], means3d[:, l].detach())
+
+    check_close(viewmat.grad, _v_viewmat, atol=5e-4, rtol=1e-5)
+    print("passed project_gaussians_viewmat_grad test")
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
+def test_project_gaussians_2d_batched():
+    num_points = 100
+
+    means3d = torch.randn((num_points, 3), device=device)
+    scales = torch.rand((num_points, 3), device=device) + 0.2
+    glob_scale = 0.1
+    quats = torch.randn((num_points, 4), device=device)
+    quats /= torch.linalg.norm(quats, dim=-1, keepdim=True)
+    opacity = torch.randn((num_points, 1), device=device)
+
+    H, W = 512, 512
+    cx, cy = W / 2, H / 2
+    fx, fy = W / 2, W / 2
+    BLOCK_SIZE = 16
+    viewmats = torch.stack(
+        [torch.eye(4, device=device), torch.eye(4, device=device)]
+    )
+    viewmats[0, 2, 3] = 8.0
+    viewmats[1, 0, 3] = 0.5
+    viewmats[1, 2, 3] = 6.0
+    projmat = projection_matrix(fx, fy, W, H)
+    projwmats = viewmats.transpose(-1, -2) @ projmat.T
+    # random weights per normal/opacity channel, one set per camera
+    weights = torch.randn((2, num_points, 4), device=device)
+
+    def run(viewmat, projwmat):
+        params = [
+            t.clone().requires_grad_(True) for t in (means3d, scales, quats, opacity)
+        ]
+        outputs = project_gaussians_2d(
+            params[0],
+            params[1],
+            glob_scale,
+            params[2],
+            params[3],
+            viewmat,
+            projwmat,
+            fx,
+            fy,
+            cx,
+            cy,
+            H,
+            W,
+            BLOCK_SIZE,
+            apply_sigmoid=True,
+        )
+        return outputs, params
+
+    outputs, params = run(viewmats, projwmats)
+    (weights * outputs[3]).sum().backward()
+
+    _params = [torch.zeros_like(p) for p in params]
+    for b in range(2):
+        _outputs, _b_params = run(viewmats[b], projwmats[b])
+        for out, _out in zip(outputs, _outputs):
+            check_close(out[b], _out)
+        (weights[b] * _outputs[3]).sum().backward()
+        for _p, _b_p in zip(_params, _b_params):
+            _p += _b_p.grad
+
+    # only the opacity gradient is exercised: the 2D backward kernel always
+    # gets transMats, so compute_transmat_aabb returns before writing the
+    # means, scales and quats gradients, which are zero by construction
+    opacity_grad, _opacity_grad = params[3].grad, _params[3]
+    assert opacity_grad.abs().sum() > 0
+    check_close(opacity_grad, _opacity_grad)
+    for p, _p in zip(params[:3], _params[:3]):
+        assert not p.grad.any() and not _p.any()
+    print("passed project_gaussians_2d_batched test")
+
+
 if __name__ == "__main__":
     test_project_gaussians_forward()
     test_project_gaussians_backward()
+    test_project_gaussians_viewmat_grad()
+    test_project_gaussians_2d_batched()
@@ -0,0 +1,136 @@
+import pytest
+import torch
+
+from gsplat.project_gaussians import project_gaussians_2d
+from gsplat.rasterize import rasterize_gaussians_2d
+
+torch.manual_seed(42)
+
+device = torch.device("cuda:0")
+
+H, W = 64, 64
+BLOCK_SIZE = 16
+
+
+def project_random_gaussians(num_points=100):
+    means3d = torch.randn((num_points, 3), device=device)
+    scales = torch.rand((num_points, 3), device=device) + 0.2
+    quats = torch.randn((num_points, 4), device=device)
+    quats /= torch.linalg.norm(quats, dim=-1, keepdim=True)
+    opacity = torch.rand((num_points, 1), device=device)
+
+    fx, fy = W / 2, W / 2
+    n, f = 0.01, 1000.0
+    viewmat = torch.eye(4, device=device)
+    viewmat[2, 3] = 8.0
+    projmat = torch.tensor(
+        [
+            [2.0 * fx / W, 0.0, 0.0, 0.0],
+            [0.0, 2.0 * fy / H, 0.0, 0.0],
+            [0.0, 0.0, (f + n) / (f - n), -2 * f * n / (f - n)],
+            [0.0, 0.0, 1.0, 0.0],
+        ],
+        device=device,
+    )
+    projwmat = viewmat.T @ projmat.T
+
+    xys, depths, transMats, normal_opacity, radii, num_tiles_hit = project_gaussians_2d(
+        means3d,
+        scales,
+        1,
+        quats,
+        opacity,
+        viewmat,
+        projwmat,
+        fx,
+        fy,
+        W / 2,
+        H / 2,
+        H,
+        W,
+        BLOCK_SIZE,
+    )
+    return xys, depths, transMats, normal_opacity, radii, num_tiles_hit
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
+def test_rasterize_2d_image_only_backward():
+    xys, depths, transMats, normal_opacity, radii, num_tiles_hit = project_random_gaussians()
+    colors = torch.rand((xys.shape[0], 3), device=device, requires_grad=True)
+    # the projection outputs are views into one buffer; make them leaves
+    transMats = transMats.clone().requires_grad_(True)
+    normal_opacity = normal_opacity.clone().requires_grad_(True)
+
+    # return_alpha=True returns the image alone; return_alpha=False also
+    # returns the auxiliary buffer, whose gradient is left undefined here
+    for return_alpha in (True, False):
+        out = rasterize_gaussians_2d(
+            xys,
+            transMats,
+            depths,
+            radii,
+            num_tiles_hit,
+            colors,
+            normal_opacity,
+            H,
+            W,
+            BLOCK_SIZE,
+            return_alpha=return_alpha,
+        )
+        out_img = out if return_alpha else out[0]
+        assert out_img.shape == (H, W, 3)
+        out_img.sum().backward()
+
+        for t in (transMats, normal_opacity, colors):
+            assert t.grad.shape == t.shape
+            assert torch.isfinite(t.grad).all()
+            t.grad = None
+    print("passed rasterize_2d_image_only_backward test")
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="No CUDA device")
+def test_rasterize_2d_grads():
+    xys, depths, transMats, normal_opacity, radii, num_tiles_hit = project_random_gaussians()
+    colors = torch.rand((xys.shape[0], 3), device=device, requires_grad=True)
+    transMats = transMats.clone().requires_grad_(True)
+    normal_opacity = normal_opacity.clone().requires_grad_(True)
+    background = torch.zeros(3, device=device)
+    weights = torch.randn((H, W, 3), device=device)
+
+    def loss(colors):
+        out_img, _ = rasterize_gaussians_2d(
+            xys,
+            transMats,
+            depths,
+            radii,
+            num_tiles_hit,
+            colors,
+            normal_opacity,
+            H,
+            W,
+            BLOCK_SIZE,
+            background=background,
+            return_alpha=False,
+        )
+        return (weights * out_img).sum()
+
+    loss(colors).backward()
+
+    # every gradient lands on the input it belongs to
+    assert colors.grad.shape == colors.shape
+    assert transMats.grad.shape == transMats.shape
+    assert normal_opacity.grad.shape == normal_opacity.shape
+
+    # on a black background the image is linear in the colors, so the
+    # directional derivative along the colors is the loss itself
+    with torch.no_grad():
+        expected = loss(colors) - loss(torch.zeros_like(colors))
+    torch.testing.assert_close(
+        (colors.grad * colors.detach()).sum(), expected, atol=1e-3, rtol=1e-4
+    )
+    print("passed rasterize_2d_grads test")
+
+
+if __name__ == "__main__":
+    test_rasterize_2d_image_only_backward()
+    test_rasterize_2d_grads()